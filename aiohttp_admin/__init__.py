@@ -1,3 +1,5 @@
+import asyncio
+
 import aiohttp_jinja2
 import jinja2
 from aiohttp import web
@@ -13,11 +15,26 @@ from .security import Permissions, require, authorize
 from .utils import gather_template_folders
 
 
-__all__ = ['AdminHandler', 'setup', 'get_admin', 'Permissions', 'require',
-           'authorize', '_setup', ]
+__all__ = ['AdminHandler', 'setup', 'setup_uvloop', 'get_admin',
+           'Permissions', 'require', 'authorize', '_setup', ]
 __version__ = '0.0.2'
 
 
+def setup_uvloop():
+    """Install the uvloop event loop policy, if uvloop is available.
+
+    Call this before creating the application and the db pools; every
+    socket read/write done by the admin backends then goes through the
+    faster libuv-based loop. Returns True when uvloop was installed.
+    """
+    try:
+        import uvloop
+    except ImportError:  # pragma: no cover
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
 def setup(app, admin_conf_path, *, resources, static_folder=None,
           template_folder=None, template_name=None, name=None,
           app_key=APP_KEY):
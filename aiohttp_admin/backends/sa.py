@@ -1,12 +1,14 @@
+import asyncio
+
 import sqlalchemy as sa
-from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import mysql, postgresql
 
 from ..resource import AbstractResource
 from ..exceptions import ObjectNotFound
 from ..security import require, Permissions
 from ..utils import (json_response, validate_payload, validate_query,
                      calc_pagination, ASC)
-from .sa_utils import table_to_trafaret, create_filter
+from .sa_utils import table_to_validator, create_filter_clause
 from ..contrib.constants import ReactComponent as rc
 
 
@@ -31,20 +33,145 @@ INPUT_TYPES = {
     postgresql.JSON: rc.JSON_INPUT.value,
 }
 
+# column types never change after registration, resolve the
+# type(column.type) dispatch once per table instead of per call
+_FIELD_TYPES_CACHE = {}
+_INPUT_TYPES_CACHE = {}
+
+
+def _cast_integer_pk(value):
+    # match_info values are strings; isdigit keeps the common path free
+    # of the int() exception machinery for non-numeric ids
+    return int(value) if value.isdigit() else value
+
+
+def _table_field_types(table):
+    try:
+        return _FIELD_TYPES_CACHE[table]
+    except KeyError:
+        field_types = {
+            name: FIELD_TYPES.get(type(column.type), rc.TEXT_FIELD.value)
+            for name, column in table.c.items()
+        }
+        _FIELD_TYPES_CACHE[table] = field_types
+        return field_types
+
 
 class PGResource(AbstractResource):
 
+    # pyformat matches the paramstyle of the underlying drivers
+    # (psycopg2/pymysql), so the precompiled SQL text below can be
+    # executed directly with a dict of parameters
+    dialect = postgresql.dialect(paramstyle='pyformat')
+
+    # fetch the total count as a window function in the same round trip
+    # as the page itself, MySQL opts out below
+    use_window_count = True
+
     def __init__(self, db, table, primary_key='id', url=None):
         super().__init__(primary_key=primary_key, resource_name=url)
         self._db = db
         self._table = table
         self._primary_key = primary_key
         self._pk = table.c[primary_key]
+        self._colnames = tuple(table.c.keys())
+        self._columns_set = frozenset(self._colnames)
+        if isinstance(self._pk.type, sa.Integer):
+            self._pk_caster = _cast_integer_pk
+        else:
+            self._pk_caster = str
         # TODO: do we ability to pass custom validator for table?
-        self._create_validator = table_to_trafaret(table, primary_key,
-                                                   skip_pk=True)
-        self._update_validator = table_to_trafaret(table, primary_key,
-                                                   skip_pk=True)
+        self._create_validator = table_to_validator(table, primary_key,
+                                                    skip_pk=True)
+        self._update_validator = table_to_validator(table, primary_key,
+                                                    skip_pk=True)
+
+        # SQLAlchemy reserves the names of the table columns for the
+        # binds of the SET clause, so naming the pk bind after a column
+        # (e.g. a table with a literal 'entity_id' column) would make
+        # the update statement uncompilable; pick a name no column uses
+        pk_bind = 'entity_id'
+        while pk_bind in table.c:
+            pk_bind = '_' + pk_bind
+        self._pk_bind = pk_bind
+
+        # table never changes after registration, so build the statements
+        # once here instead of on every request
+        self._select_stmt = table.select()
+        self._detail_stmt = (table.select()
+                             .where(self._pk == sa.bindparam(pk_bind)))
+        self._insert_stmt = table.insert().returning(*table.c)
+        self._update_stmt = (table.update()
+                             .where(self._pk == sa.bindparam(pk_bind))
+                             .returning(*table.c))
+        self._delete_stmt = (table.delete()
+                             .where(self._pk == sa.bindparam(pk_bind)))
+        self._count_stmt = sa.select([sa.func.count()]).select_from(table)
+
+        # point lookups by primary key never change, compile them down to
+        # SQL text once so the SQLAlchemy compiler is skipped entirely on
+        # these hot paths
+        self._detail_sql = str(self._detail_stmt.compile(
+            dialect=self.dialect))
+        self._delete_sql = str(self._delete_stmt.compile(
+            dialect=self.dialect))
+
+        # partial evaluation of the simplest hot handlers: rebind them
+        # to closures with the per-resource constants in locals, unless
+        # a subclass provides its own implementation
+        if type(self).detail is PGResource.detail:
+            self.detail = self._specialize_detail()
+        if type(self).delete is PGResource.delete:
+            self.delete = self._specialize_delete()
+
+    def _specialize_detail(self):
+        """Build a detail handler with every per-request attribute
+        lookup (pool, sql text, pk caster, column names) pre-bound.
+        """
+        pool = self._db
+        detail_sql = self._detail_sql
+        pk_caster = self._pk_caster
+        pk_bind = self._pk_bind
+        colnames = self._colnames
+
+        async def detail(request):
+            await require(request, Permissions.view)
+            entity_id = pk_caster(request.match_info['entity_id'])
+            async with pool.acquire() as conn:
+                resp = await conn.execute(detail_sql,
+                                          {pk_bind: entity_id})
+                rec = await resp.first()
+
+            if not rec:
+                msg = 'Entity with id: {} not found'.format(entity_id)
+                raise ObjectNotFound(msg)
+
+            return json_response({name: rec[name] for name in colnames})
+
+        return detail
+
+    def _specialize_delete(self):
+        """Same as _specialize_detail for the delete handler."""
+        pool = self._db
+        delete_sql = self._delete_sql
+        pk_caster = self._pk_caster
+        pk_bind = self._pk_bind
+
+        async def delete(request):
+            await require(request, Permissions.delete)
+            entity_id = pk_caster(request.match_info['entity_id'])
+            async with pool.acquire() as conn:
+                await conn.execute(delete_sql, {pk_bind: entity_id})
+
+            return json_response({'status': 'deleted'})
+
+        return delete
+
+    def _rec_to_entity(self, rec):
+        # cheaper than dict(rec): iterates the cached column tuple
+        # instead of the per-row keymap and ignores extra columns such
+        # as the _total_count window label
+        return {name: rec[name] for name in self._colnames}
 
     @property
     def pool(self):
@@ -65,20 +192,18 @@ class PGResource(AbstractResource):
         :return: list - list of the tuples `(field_name, fields_type)`
         """
 
+        field_types = _table_field_types(table)
+
         if not fields:
             fields = table.primary_key
+        else:
+            fields = set(fields)
 
-        actual_fields = [
-            field for field in table.c.items() if field[0] in fields
-        ]
-
-        data_type_fields = {
-            name: FIELD_TYPES.get(type(field_type.type), rc.TEXT_FIELD.value)
-            for name, field_type in actual_fields
+        return {
+            name: field_type for name, field_type in field_types.items()
+            if name in fields
         }
 
-        return data_type_fields
-
     @staticmethod
     def get_type_for_inputs(table):
         """
@@ -87,161 +212,241 @@ class PGResource(AbstractResource):
         :param table: sa.Table - the current table
         :return: list - list of the dictionaries
         """
-        return [
-            dict(
-                type=INPUT_TYPES.get(
-                    type(field_type.type), rc.TEXT_INPUT.value
-                ),
-                name=name,
-                isPrimaryKey=(name in table.primary_key),
-                props=None,
-            ) for name, field_type in table.c.items()
-        ]
+        try:
+            return _INPUT_TYPES_CACHE[table]
+        except KeyError:
+            inputs = [
+                dict(
+                    type=INPUT_TYPES.get(
+                        type(field_type.type), rc.TEXT_INPUT.value
+                    ),
+                    name=name,
+                    isPrimaryKey=(name in table.primary_key),
+                    props=None,
+                ) for name, field_type in table.c.items()
+            ]
+            _INPUT_TYPES_CACHE[table] = inputs
+            return inputs
 
     async def list(self, request):
         await require(request, Permissions.view)
-        columns_names = list(self._table.c.keys())
-        q = validate_query(request.query, columns_names)
+        q = validate_query(request.query, self._columns_set)
         paging = calc_pagination(q, self._primary_key)
 
         filters = q.get('_filters')
         async with self.pool.acquire() as conn:
             if filters:
-                query = create_filter(self.table, filters)
+                # count from the bare WHERE clause instead of wrapping
+                # the whole page select in a subquery, which forces the
+                # planner to materialize the derived table
+                filter_clause = create_filter_clause(self.table, filters)
+                query = self._select_stmt.where(filter_clause)
+                count_stmt = self._count_stmt.where(filter_clause)
             else:
-                query = self.table.select()
-            count = await conn.scalar(
-                sa.select([sa.func.count()])
-                .select_from(query.alias('foo')))
+                query = self._select_stmt
+                count_stmt = self._count_stmt
 
             sort_dir = sa.asc if paging.sort_dir == ASC else sa.desc
-            cursor = await conn.execute(
-                query
-                .offset(paging.offset)
-                .limit(paging.limit)
-                .order_by(sort_dir(paging.sort_field)))
-
-            recs = await cursor.fetchall()
+            page_query = (query
+                          .offset(paging.offset)
+                          .limit(paging.limit)
+                          .order_by(sort_dir(paging.sort_field)))
+
+            if self.use_window_count:
+                page_query = page_query.column(
+                    sa.func.count().over().label('_total_count'))
+                cursor = await conn.execute(page_query)
+                recs = await cursor.fetchall()
+                if recs:
+                    count = recs[0]['_total_count']
+                elif paging.offset:
+                    # page past the end of the result set, there is no
+                    # row to read the window total from
+                    count = await conn.scalar(count_stmt)
+                else:
+                    count = 0
+            else:
+                count = await conn.scalar(count_stmt)
+                cursor = await conn.execute(page_query)
+                recs = await cursor.fetchall()
 
-            entities = list(map(dict, recs))
+            entities = [self._rec_to_entity(rec) for rec in recs]
 
         headers = {'X-Total-Count': str(count)}
         return json_response(entities, headers=headers)
 
     async def detail(self, request):
         await require(request, Permissions.view)
-        entity_id = request.match_info['entity_id']
+        entity_id = self._pk_caster(request.match_info['entity_id'])
         async with self.pool.acquire() as conn:
-            query = self.table.select().where(self._pk == entity_id)
-            resp = await conn.execute(query)
+            resp = await conn.execute(self._detail_sql,
+                                      {self._pk_bind: entity_id})
             rec = await resp.first()
 
         if not rec:
             msg = 'Entity with id: {} not found'.format(entity_id)
             raise ObjectNotFound(msg)
 
-        entity = dict(rec)
+        entity = self._rec_to_entity(rec)
         return json_response(entity)
 
     async def create(self, request):
-        await require(request, Permissions.add)
-        raw_payload = await request.read()
+        # permission lookup and body read are independent awaits, run
+        # them concurrently
+        _, raw_payload = await asyncio.gather(
+            require(request, Permissions.add), request.read())
         data = validate_payload(raw_payload, self._create_validator)
 
         async with self.pool.acquire() as conn:
-            query = self.table.insert().values(data).returning(*self.table.c)
+            query = self._insert_stmt.values(data)
             rec = await conn.execute(query)
             row = await rec.first()
-            await conn.execute('commit;')
 
-        entity = dict(row)
+        entity = self._rec_to_entity(row)
         return json_response(entity)
 
     async def update(self, request):
-        await require(request, Permissions.edit)
-        entity_id = request.match_info['entity_id']
-        raw_payload = await request.read()
-        data = validate_payload(raw_payload, self._update_validator)
-
-        # TODO: execute in transaction?
-        async with self.pool.acquire() as conn:
-            query = self.table.select().where(self._pk == entity_id)
-            row = await conn.execute(query)
+        # check out the connection right away so waiting for a free one
+        # in the pool overlaps the permission check and the body read
+        acquire_task = asyncio.ensure_future(self.pool.acquire())
+        try:
+            _, raw_payload = await asyncio.gather(
+                require(request, Permissions.edit), request.read())
+            entity_id = self._pk_caster(request.match_info['entity_id'])
+            data = validate_payload(raw_payload, self._update_validator)
+        except BaseException:
+            # BaseException: CancelledError from a client disconnect
+            # must not leak the connection either. Never await the task
+            # here - a failed acquire would mask the original error.
+            if not acquire_task.done():
+                acquire_task.cancel()
+            elif (not acquire_task.cancelled()
+                    and acquire_task.exception() is None):
+                self.pool.release(acquire_task.result())
+            raise
+
+        conn = await acquire_task
+        try:
+            # UPDATE ... RETURNING does the existence check for free: no
+            # row comes back when the entity is missing
+            row = await conn.execute(self._update_stmt.values(data),
+                                     {self._pk_bind: entity_id})
             rec = await row.first()
-            if not rec:
-                msg = 'Entity with id: {} not found'.format(entity_id)
-                raise ObjectNotFound(msg)
+        finally:
+            self.pool.release(conn)
 
-            row = await conn.execute(
-                self.table.update()
-                .values(data)
-                .returning(*self.table.c)
-                .where(self._pk == entity_id))
-            rec = await row.first()
-            await conn.execute('commit;')
+        if not rec:
+            msg = 'Entity with id: {} not found'.format(entity_id)
+            raise ObjectNotFound(msg)
 
-        entity = dict(rec)
+        entity = self._rec_to_entity(rec)
         return json_response(entity)
 
     async def delete(self, request):
         await require(request, Permissions.delete)
-        entity_id = request.match_info['entity_id']
+        entity_id = self._pk_caster(request.match_info['entity_id'])
 
         async with self.pool.acquire() as conn:
-            query = self.table.delete().where(self._pk == entity_id)
-            await conn.execute(query)
-            # TODO: Think about autocommit by default
-            await conn.execute('commit;')
+            await conn.execute(self._delete_sql, {self._pk_bind: entity_id})
 
         return json_response({'status': 'deleted'})
 
 
 class MySQLResource(PGResource):
+    """MySQL flavour of the admin resource.
+
+    The engine passed in as ``db`` should be created with
+    ``aiomysql.sa.create_engine(..., autocommit=True)`` - mutations are
+    no longer followed by an explicit ``commit;`` round trip. Engines
+    created without it are handled too: autocommit is switched on the
+    first time a connection is used for a write.
+    """
+
+    dialect = mysql.dialect(paramstyle='pyformat')
+
+    # window functions are not available on the MySQL versions we
+    # support, keep the separate count query there
+    use_window_count = False
+
+    def __init__(self, db, table, primary_key='id', url=None):
+        super().__init__(db, table, primary_key=primary_key, url=url)
+        # MySQL has no RETURNING clause, new values are fetched explicitly
+        self._insert_stmt = table.insert()
+        self._update_stmt = (table.update()
+                             .where(self._pk == sa.bindparam(self._pk_bind)))
+
+    @staticmethod
+    async def _ensure_autocommit(conn):
+        # without autocommit the writes below would silently roll back
+        # when the connection goes back to the pool; the mode is sticky
+        # per connection, so each pooled connection pays the SET at most
+        # once
+        raw = conn.connection
+        if not raw.get_autocommit():
+            await raw.autocommit(True)
+
+    async def delete(self, request):
+        await require(request, Permissions.delete)
+        entity_id = self._pk_caster(request.match_info['entity_id'])
+
+        async with self.pool.acquire() as conn:
+            await self._ensure_autocommit(conn)
+            await conn.execute(self._delete_sql, {self._pk_bind: entity_id})
+
+        return json_response({'status': 'deleted'})
 
     async def create(self, request):
-        await require(request, Permissions.add)
-        raw_payload = await request.read()
+        # permission lookup and body read are independent awaits, run
+        # them concurrently
+        _, raw_payload = await asyncio.gather(
+            require(request, Permissions.add), request.read())
         data = validate_payload(raw_payload, self._create_validator)
 
         async with self.pool.acquire() as conn:
-            rec = await conn.execute(self.table.insert().values(data))
+            await self._ensure_autocommit(conn)
+            rec = await conn.execute(self._insert_stmt.values(data))
             new_entity_id = rec.lastrowid
-            resp = await conn.execute(
-                self.table.select()
-                .where(self._pk == new_entity_id))
+            resp = await conn.execute(self._detail_sql,
+                                      {self._pk_bind: new_entity_id})
             rec = await resp.first()
-            await conn.execute('commit;')
 
-        entity = dict(rec)
+        entity = self._rec_to_entity(rec)
         return json_response(entity)
 
     async def update(self, request):
-        await require(request, Permissions.edit)
-        entity_id = request.match_info['entity_id']
-        raw_payload = await request.read()
-        data = validate_payload(raw_payload, self._update_validator)
-
-        # TODO: execute in transaction?
-        async with self.pool.acquire() as conn:
-            row = await conn.execute(
-                self.table.select()
-                .where(self._pk == entity_id)
-            )
-            rec = await row.first()
-            if not rec:
-                msg = 'Entity with id: {} not found'.format(entity_id)
-                raise ObjectNotFound(msg)
-
-            await conn.execute(
-                self.table.update()
-                .values(data)
-                .where(self._pk == entity_id))
-
-            await conn.execute('commit;')
-            resp = await conn.execute(
-                self.table.select()
-                .where(self._pk == entity_id))
+        # same overlap of pool checkout with auth and body read as in
+        # PGResource.update, including the cancellation-safe error path
+        acquire_task = asyncio.ensure_future(self.pool.acquire())
+        try:
+            _, raw_payload = await asyncio.gather(
+                require(request, Permissions.edit), request.read())
+            entity_id = self._pk_caster(request.match_info['entity_id'])
+            data = validate_payload(raw_payload, self._update_validator)
+        except BaseException:
+            if not acquire_task.done():
+                acquire_task.cancel()
+            elif (not acquire_task.cancelled()
+                    and acquire_task.exception() is None):
+                self.pool.release(acquire_task.result())
+            raise
+
+        conn = await acquire_task
+        try:
+            await self._ensure_autocommit(conn)
+            # no RETURNING on MySQL; the SELECT that fetches the updated
+            # row doubles as the existence check
+            await conn.execute(self._update_stmt.values(data),
+                               {self._pk_bind: entity_id})
+
+            resp = await conn.execute(self._detail_sql,
+                                      {self._pk_bind: entity_id})
             rec = await resp.first()
+        finally:
+            self.pool.release(conn)
+
+        if not rec:
+            msg = 'Entity with id: {} not found'.format(entity_id)
+            raise ObjectNotFound(msg)
 
-        entity = dict(rec)
+        entity = self._rec_to_entity(rec)
         return json_response(entity)
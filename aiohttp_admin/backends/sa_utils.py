@@ -1,16 +1,53 @@
+import datetime
 import operator as _operator
+import typing
 
 import sqlalchemy as sa
 import trafaret as t
 from sqlalchemy.dialects import postgresql
-from sqlalchemy.sql import or_
+from sqlalchemy.sql import and_, or_
 from trafaret.contrib.rfc_3339 import DateTime
 
 from ..exceptions import JsonValidaitonError
 from ..utils import MULTI_FIELD_TEXT_QUERY, as_dict
 
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
 
-__all__ = ['table_to_trafaret', 'create_filter']
+
+__all__ = ['table_to_trafaret', 'table_to_msgspec', 'table_to_validator',
+           'create_filter', 'create_filter_clause', 'create_admin_engine',
+           'create_admin_mysql_engine']
+
+
+async def create_admin_engine(dsn, *, minsize=10, maxsize=50,
+                              pool_recycle=300, **kwargs):
+    """Create an aiopg.sa engine sized for the admin workload.
+
+    A pool that keeps connections warm (minsize) avoids the connect
+    handshake on the request path, while pool_recycle drops connections
+    idle for too long. The engine should be created once at application
+    startup and shared by all resources.
+    """
+    from aiopg.sa import create_engine
+    return await create_engine(dsn, minsize=minsize, maxsize=maxsize,
+                               pool_recycle=pool_recycle, **kwargs)
+
+
+async def create_admin_mysql_engine(*, minsize=10, maxsize=50,
+                                    pool_recycle=300, autocommit=True,
+                                    **kwargs):
+    """Create an aiomysql.sa engine sized for the admin workload.
+
+    autocommit defaults to True because MySQLResource no longer issues
+    explicit commits after mutations.
+    """
+    from aiomysql.sa import create_engine
+    return await create_engine(minsize=minsize, maxsize=maxsize,
+                               pool_recycle=pool_recycle,
+                               autocommit=autocommit, **kwargs)
 
 
 AnyDict = t.Dict({}).allow_extra('*')
@@ -90,6 +127,100 @@ def table_to_trafaret(table, primary_key, skip_pk=False):
     return t.Dict(trafaret).ignore_extra(primary_key)
 
 
+def build_msgspec_type(sa_type):
+    """Return the msgspec annotation for `sa_type` or None when the type
+    can not be expressed (caller falls back to trafaret)."""
+
+    # check for Text should be before String
+    if isinstance(sa_type, sa.sql.sqltypes.Text):
+        annotation = str
+
+    elif isinstance(sa_type, sa.sql.sqltypes.String):
+        if isinstance(sa_type, sa.sql.sqltypes.Enum):
+            return None
+        if sa_type.length:
+            annotation = typing.Annotated[
+                str, msgspec.Meta(max_length=sa_type.length)]
+        else:
+            annotation = str
+
+    elif isinstance(sa_type, sa.sql.sqltypes.Boolean):
+        annotation = bool
+
+    elif isinstance(sa_type, sa.sql.sqltypes.Integer):
+        annotation = int
+
+    elif isinstance(sa_type, sa.sql.sqltypes.Float):
+        annotation = float
+
+    elif isinstance(sa_type, sa.sql.sqltypes.DateTime):
+        annotation = datetime.datetime
+
+    elif isinstance(sa_type, sa.sql.sqltypes.Date):
+        annotation = datetime.date
+
+    elif isinstance(sa_type, postgresql.JSON):
+        annotation = typing.Union[dict, list]
+
+    elif isinstance(sa_type, postgresql.ARRAY):
+        item_annotation = build_msgspec_type(sa_type.item_type)
+        if item_annotation is None:
+            return None
+        annotation = typing.List[item_annotation]
+
+    else:
+        annotation = None
+    return annotation
+
+
+def table_to_msgspec(table, primary_key, skip_pk=False):
+    """Build a msgspec.Struct validating payloads for `table`.
+
+    msgspec parses and validates the raw json body in one C pass, which
+    is much cheaper than json.loads plus a trafaret walk. Returns None
+    when msgspec is not installed or the table uses column types it can
+    not express; callers are expected to fall back to trafaret then.
+    """
+    if msgspec is None:
+        return None
+
+    fields = []
+    ignored = []
+    for name, column in table.c.items():
+        if skip_pk and column.name == primary_key:
+            # mirror trafaret's .ignore_extra(primary_key): the pk may
+            # be present in the payload but is dropped, every other
+            # unknown key is rejected. Optional fields go last because
+            # defstruct rejects a default before a required field.
+            ignored.append(str(name))
+            continue
+        if column.server_default is not None:
+            # trafaret keys carry the server default, msgspec has no
+            # equivalent notion for required-with-default fields
+            return None
+        annotation = build_msgspec_type(column.type)
+        if annotation is None:
+            return None
+        if column.nullable:
+            annotation = typing.Optional[annotation]
+        fields.append((str(name), annotation))
+
+    fields.extend((name, typing.Any, None) for name in ignored)
+    return msgspec.defstruct('{}_payload'.format(table.name), fields,
+                             forbid_unknown_fields=True,
+                             namespace={'_ignored_fields': tuple(ignored)})
+
+
+def table_to_validator(table, primary_key, skip_pk=False):
+    """Build the fastest payload validator available for `table`:
+    a msgspec.Struct when possible, a trafaret otherwise.
+    """
+    validator = table_to_msgspec(table, primary_key, skip_pk=skip_pk)
+    if validator is None:
+        validator = table_to_trafaret(table, primary_key, skip_pk=skip_pk)
+    return validator
+
+
 def to_column(column_name, table):
     c = table.c[column_name]
     return c
@@ -152,7 +283,7 @@ def check_value(column, value):
     return value
 
 
-def text_filter(query, value, table):
+def text_filter_clause(value, table):
     pairs = ((n, c) for n, c in table.c.items()
              if isinstance(c.type, sa.sql.sqltypes.String))
     sub_queries = []
@@ -160,20 +291,21 @@ def text_filter(query, value, table):
         do_compare = op("like", column)
         sub_queries.append(do_compare(column, value))
 
-    query = query.where(or_(*sub_queries))
-    return query
+    return or_(*sub_queries)
 
 
 # TODO: validate that value supplied in filter has same type as in table
-# TODO: use functional style to create query
-def create_filter(table, filter):
-    query = table.select()
+def create_filter_clause(table, filter):
+    """Build the WHERE clause for `filter` without wrapping anything in
+    a select, so callers can reuse it for both page and count queries.
+    """
+    clauses = []
 
     for column_name, operation in filter.items():
 
         if column_name == MULTI_FIELD_TEXT_QUERY:
             value = operation
-            query = text_filter(query, value, table)
+            clauses.append(text_filter_clause(value, table))
             continue
 
         column = to_column(column_name, table)
@@ -186,7 +318,10 @@ def create_filter(table, filter):
             check_comparator(column, op_name)
             value = check_value(column, value)
             do_compare = op(op_name, column)
-            f = do_compare(column, value)
-            query = query.where(f)
+            clauses.append(do_compare(column, value))
+
+    return and_(*clauses)
 
-    return query
+
+def create_filter(table, filter):
+    return table.select().where(create_filter_clause(table, filter))
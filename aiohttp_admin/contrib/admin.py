@@ -1,5 +1,10 @@
 import json
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 
 __all__ = ['Schema', ]
 
@@ -23,7 +28,21 @@ class Schema:
             pass
 
         """
-        self.endpoints.append(Endpoint())
+        endpoint = Endpoint()
+
+        # endpoint description is static after registration, build its
+        # json fragment here once instead of on every to_json call
+        data = endpoint.to_dict()
+        data['fields'] = endpoint.Meta.resource_type.get_type_of_fields(
+            endpoint.fields,
+            endpoint.Meta.table,
+        )
+        endpoint._prebuilt_json_fragment = data
+
+        self.endpoints.append(endpoint)
+        # keep the list ordered here so to_json does not re-sort
+        # constant data on every call
+        self.endpoints.sort(key=lambda e: e.name)
 
         return Endpoint
 
@@ -31,24 +50,19 @@ class Schema:
         """
         Prepare data for the initial state of the admin-on-rest
         """
-        endpoints = []
-        for endpoint in self.endpoints:
-            list_fields = endpoint.fields
-            resource_type = endpoint.Meta.resource_type
-            table = endpoint.Meta.table
-
-            data = endpoint.to_dict()
-            data['fields'] = resource_type.get_type_of_fields(
-                list_fields,
-                table,
-            )
-            endpoints.append(data)
-
         data = {
             'title': self.title,
-            'endpoints': sorted(endpoints, key=lambda x: x['name']),
+            'endpoints': [
+                endpoint._prebuilt_json_fragment
+                for endpoint in self.endpoints
+            ],
         }
 
+        if orjson is not None:
+            # OPT_NON_STR_KEYS: field names are sqlalchemy quoted_name
+            # instances, a str subclass orjson rejects as dict keys
+            return orjson.dumps(
+                data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
         return json.dumps(data)
 
     @property
@@ -16,9 +16,19 @@ try:
 except ImportError:  # pragma: no cover
     ObjectId = None
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
+
 
-__all__ = ['json_response', 'jsonify', 'validate_query', 'validate_payload',
-           'gather_template_folders']
+__all__ = ['json_response', 'jsonify', 'validate_query',
+           'validate_payload', 'gather_template_folders']
 
 
 PagingParams = namedtuple('PagingParams',
@@ -41,7 +51,25 @@ def json_datetime_serial(obj):
 
 jsonify = partial(json.dumps, default=json_datetime_serial)
 
-json_response = partial(web.json_response, dumps=jsonify)
+
+_sentinel = object()
+
+
+def json_response(data=_sentinel, *, headers=None, status=200):
+    """Like web.json_response but encodes straight to the bytes body,
+    skipping the intermediate str that a dumps= callable would allocate.
+    """
+    if data is _sentinel:
+        body = None
+    elif orjson is not None:
+        # OPT_NON_STR_KEYS: sqlalchemy column names are str subclasses
+        # (quoted_name), which orjson refuses as dict keys by default
+        body = orjson.dumps(data, default=json_datetime_serial,
+                            option=orjson.OPT_NON_STR_KEYS)
+    else:  # pragma: no cover
+        body = jsonify(data).encode('utf-8')
+    return web.Response(body=body, status=status, headers=headers,
+                        content_type='application/json')
 
 
 OptKey = partial(t.Key, optional=True)
@@ -104,6 +132,22 @@ def validate_query_structure(query):
 
 
 def validate_payload(raw_payload, schema):
+    if (msgspec is not None and isinstance(schema, type)
+            and issubclass(schema, msgspec.Struct)):
+        # parse and validate in one pass, strict=False mirrors the
+        # coercions trafaret's ToInt/ToBool/ToFloat apply
+        try:
+            parsed = msgspec.json.decode(raw_payload, type=schema,
+                                         strict=False)
+        except msgspec.DecodeError as exc:
+            raise JsonValidaitonError(str(exc))
+        data = msgspec.structs.asdict(parsed)
+        # fields that are accepted but not part of the payload proper,
+        # e.g. the primary key trafaret used to ignore_extra
+        for name in getattr(schema, '_ignored_fields', ()):
+            data.pop(name, None)
+        return data
+
     payload = raw_payload.decode(encoding='UTF-8')
     try:
         parsed = json.loads(payload)
@@ -140,7 +184,7 @@ def validate_query(query, possible_columns):
         columns.append(sort_field)
 
     not_valid = set(columns).difference(
-        possible_columns + [MULTI_FIELD_TEXT_QUERY])
+        possible_columns, (MULTI_FIELD_TEXT_QUERY,))
     if not_valid:
         column_list = ', '.join(not_valid)
         msg = 'Columns: {} do not present in resource'.format(column_list)
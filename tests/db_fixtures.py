@@ -42,6 +42,7 @@ def mysql(request, loop, mysql_params):
             port=conf['port'],
             minsize=1,
             maxsize=2,
+            autocommit=True,
             loop=loop)
         return engine
     engine = loop.run_until_complete(init_mysql(mysql_params, loop))
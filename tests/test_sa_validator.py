@@ -2,7 +2,17 @@ import pytest
 import trafaret as t
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
-from aiohttp_admin.backends.sa_utils import table_to_trafaret
+from aiohttp_admin.backends.sa_utils import (table_to_trafaret,
+                                             table_to_msgspec,
+                                             table_to_validator)
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+needs_msgspec = pytest.mark.skipif(msgspec is None,
+                                   reason='msgspec is not installed')
 
 
 @pytest.fixture
@@ -73,3 +83,97 @@ def test_validation_bad_input(table):
     with pytest.raises(t.DataError):
         data = {}
         traf(data)
+
+
+@pytest.fixture
+def simple_table():
+
+    meta = sa.MetaData()
+    user = sa.Table(
+        'user', meta,
+        sa.Column('id', sa.Integer, nullable=False),
+        sa.Column('name', sa.String(64), nullable=False),
+        sa.Column('age', sa.Integer, nullable=True),
+
+        # Indexes #
+        sa.PrimaryKeyConstraint('id', name='user_id_pkey'))
+    return user
+
+
+@needs_msgspec
+def test_msgspec_keys(simple_table):
+    struct = table_to_msgspec(simple_table, 'id', skip_pk=False)
+    assert sorted(struct.__struct_fields__) == ['age', 'id', 'name']
+    assert struct._ignored_fields == ()
+
+
+@needs_msgspec
+def test_msgspec_skip_pk(simple_table):
+    struct = table_to_msgspec(simple_table, 'id', skip_pk=True)
+    # the pk stays a field so payloads carrying it are not rejected,
+    # but it is marked so validate_payload drops it
+    assert sorted(struct.__struct_fields__) == ['age', 'id', 'name']
+    assert struct._ignored_fields == ('id',)
+
+
+@needs_msgspec
+def test_msgspec_validation(simple_table):
+    struct = table_to_msgspec(simple_table, 'id', skip_pk=False)
+    raw = b'{"id": "1", "name": "bob", "age": "42"}'
+    data = msgspec.json.decode(raw, type=struct, strict=False)
+    assert data.id == 1
+    assert data.name == 'bob'
+    assert data.age == 42
+
+    # nullable column accepts null, not-nullable does not
+    raw = b'{"id": 1, "name": "bob", "age": null}'
+    data = msgspec.json.decode(raw, type=struct, strict=False)
+    assert data.age is None
+
+    with pytest.raises(msgspec.DecodeError):
+        raw = b'{"id": 1, "name": null, "age": 42}'
+        msgspec.json.decode(raw, type=struct, strict=False)
+
+
+@needs_msgspec
+def test_msgspec_rejects_unknown_fields(simple_table):
+    struct = table_to_msgspec(simple_table, 'id', skip_pk=True)
+    raw = b'{"name": "bob", "age": 42, "extra": true}'
+    with pytest.raises(msgspec.DecodeError):
+        msgspec.json.decode(raw, type=struct, strict=False)
+
+    with pytest.raises(msgspec.DecodeError):
+        msgspec.json.decode(b'{"age": 42}', type=struct, strict=False)
+
+
+@needs_msgspec
+def test_msgspec_fallback_to_trafaret(table):
+    # the post table has server_default columns, which msgspec can not
+    # express, so table_to_msgspec gives up and table_to_validator
+    # falls back to the trafaret
+    assert table_to_msgspec(table, 'id', skip_pk=True) is None
+    validator = table_to_validator(table, 'id', skip_pk=True)
+    assert isinstance(validator, t.Trafaret)
+
+
+@needs_msgspec
+def test_msgspec_fallback_on_enum():
+    meta = sa.MetaData()
+    tbl = sa.Table(
+        'color', meta,
+        sa.Column('id', sa.Integer, nullable=False),
+        sa.Column('name', sa.Enum('red', 'green', name='color_name'),
+                  nullable=False),
+
+        # Indexes #
+        sa.PrimaryKeyConstraint('id', name='color_id_pkey'))
+    assert table_to_msgspec(tbl, 'id') is None
+    validator = table_to_validator(tbl, 'id')
+    assert isinstance(validator, t.Trafaret)
+
+
+@needs_msgspec
+def test_table_to_validator_prefers_msgspec(simple_table):
+    validator = table_to_validator(simple_table, 'id', skip_pk=True)
+    assert isinstance(validator, type)
+    assert issubclass(validator, msgspec.Struct)
@@ -1,4 +1,6 @@
 import json
+from datetime import datetime
+
 import pytest
 import trafaret as t
 
@@ -6,7 +8,8 @@ from bson import ObjectId
 
 from aiohttp_admin.exceptions import JsonValidaitonError
 from aiohttp_admin.utils import (validate_query_structure, jsonify,
-                                 validate_payload, as_dict, SimpleType)
+                                 json_response, validate_payload, as_dict,
+                                 SimpleType)
 
 
 def test_validate_query_empty_defaults():
@@ -95,6 +98,35 @@ def test_jsonify_failed():
         jsonify(object())
 
 
+def test_json_response():
+    resp = json_response({'foo': 'bar'})
+    assert resp.status == 200
+    assert resp.content_type == 'application/json'
+    assert json.loads(resp.body.decode('utf-8')) == {'foo': 'bar'}
+
+
+def test_json_response_datetime():
+    obj = {'when': datetime(2015, 12, 15, 11, 2, 1)}
+    resp = json_response(obj)
+    assert json.loads(resp.body.decode('utf-8')) == {
+        'when': '2015-12-15T11:02:01'}
+
+
+def test_json_response_headers_and_status():
+    headers = {'X-Total-Count': '42'}
+    resp = json_response([], headers=headers, status=201)
+    assert resp.status == 201
+    assert resp.headers['X-Total-Count'] == '42'
+    assert json.loads(resp.body.decode('utf-8')) == []
+
+
+def test_json_response_no_data():
+    resp = json_response(status=204)
+    assert resp.status == 204
+    assert resp.body is None
+    assert resp.content_type == 'application/json'
+
+
 def test_validate_payload():
     raw_data = b'{"foo": "bar"}'
     schema = t.Dict({
@@ -130,6 +162,44 @@ def test_validate_payload_not_valid_schema():
     assert error['error'] == 'Invalid json payload'
 
 
+@pytest.fixture
+def msgspec_schema():
+    msgspec = pytest.importorskip('msgspec')
+    import typing
+    # shaped like the structs table_to_msgspec builds with skip_pk=True
+    return msgspec.defstruct(
+        'payload',
+        [('name', str), ('views', int), ('id', typing.Any, None)],
+        forbid_unknown_fields=True,
+        namespace={'_ignored_fields': ('id',)})
+
+
+def test_validate_payload_msgspec(msgspec_schema):
+    raw_data = b'{"name": "bob", "views": "42"}'
+    data = validate_payload(raw_data, msgspec_schema)
+    assert data == {'name': 'bob', 'views': 42}
+
+
+def test_validate_payload_msgspec_drops_pk(msgspec_schema):
+    raw_data = b'{"name": "bob", "views": 42, "id": 1}'
+    data = validate_payload(raw_data, msgspec_schema)
+    assert data == {'name': 'bob', 'views': 42}
+
+
+def test_validate_payload_msgspec_not_json(msgspec_schema):
+    with pytest.raises(JsonValidaitonError):
+        validate_payload(b'foo=bar', msgspec_schema)
+
+
+def test_validate_payload_msgspec_not_valid(msgspec_schema):
+    with pytest.raises(JsonValidaitonError):
+        validate_payload(b'{"views": 42}', msgspec_schema)
+
+    with pytest.raises(JsonValidaitonError):
+        validate_payload(b'{"name": "bob", "views": 42, "extra": 1}',
+                         msgspec_schema)
+
+
 def test_as_dict():
     exc = t.DataError('err')
     resp = as_dict(exc)